@@ -1,8 +1,16 @@
 import streamlit as st
 import os
-import PyPDF2
+import shutil
+import bisect
+import hashlib
+import fitz
+import ahocorasick
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Set up page configuration
@@ -10,6 +18,46 @@ st.set_page_config(page_title="E-Library Organizer", layout="wide")
 
 # API key for Google Books API
 GOOGLE_BOOKS_API_KEY = st.secrets["GOOGLE_BOOKS_API_KEY"]
+GOOGLE_BOOKS_URL = "https://www.googleapis.com/books/v1/volumes"
+
+# Keywords used to detect resumes/CVs and to categorize other documents
+RESUME_KEYWORDS = ['resume', 'cv', 'curriculum vitae', 'professional experience',
+                   'education', 'skills', 'work experience']
+CATEGORY_KEYWORDS = {
+    "Business": ["business", "management", "finance", "marketing", "economics"],
+    "Technology": ["programming", "software", "computer", "technology", "engineering"],
+    "Science": ["science", "physics", "chemistry", "biology", "research"],
+    "Education": ["education", "learning", "teaching", "academic", "school"],
+    "Other": []
+}
+
+# Shared resources are built once per process instead of on every script rerun
+@st.cache_resource
+def get_session():
+    """Shared HTTP session so keep-alive connections are reused across lookups"""
+    session = requests.Session()
+    # Retry transient failures a bounded number of times so slow peers fail fast
+    # Retry-After is ignored so a 429 cannot stall the upload page for an uncapped time
+    retry = Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504],
+                  respect_retry_after_header=False)
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+    return session
+
+@st.cache_resource
+def get_resume_automaton():
+    """Aho-Corasick automaton so resume keywords are matched in a single pass"""
+    automaton = ahocorasick.Automaton()
+    for keyword in RESUME_KEYWORDS:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+@st.cache_resource
+def get_category_needles():
+    """Flat (category, keyword bytes) table in priority order, most common categories first"""
+    return [(category, keyword.encode())
+            for category, keywords in CATEGORY_KEYWORDS.items()
+            for keyword in keywords]
 
 # Create directories for storing files
 UPLOAD_DIR = Path("uploads")
@@ -18,49 +66,72 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 # Session state initialization
 if 'library' not in st.session_state:
     st.session_state.library = []
+if 'book_ids' not in st.session_state:
+    # Ids of books already in the library, so re-adding an upload is refused
+    st.session_state.book_ids = set()
+if 'by_genre' not in st.session_state:
+    # Genre -> books index, kept in sync with the library on insert
+    st.session_state.by_genre = defaultdict(list)
+if 'sorted_by' not in st.session_state:
+    # Per-field lists of (sort key, library position), kept sorted on insert
+    st.session_state.sorted_by = {'title': [], 'author': [], 'genre': []}
 
-def extract_pdf_metadata(file_path):
-    """Extract metadata and content from PDF files"""
+def extract_pdf_metadata(file_path, data=None):
+    """Extract metadata and content from PDF files, or from in-memory PDF bytes"""
     try:
-        with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            info = reader.metadata
+        if data is not None:
+            doc = fitz.open(stream=data, filetype="pdf")
+        else:
+            doc = fitz.open(file_path)
+        try:
+            info = doc.metadata or {}
+            page_count = doc.page_count
             
             # Extract text from first page for better title/content detection
-            first_page_text = reader.pages[0].extract_text() if len(reader.pages) > 0 else ""
-            
-            # Try to determine if it's a resume/CV
-            is_resume = any(keyword in first_page_text.lower() for keyword in 
-                           ['resume', 'cv', 'curriculum vitae', 'professional experience', 
-                            'education', 'skills', 'work experience'])
-            
-            title = info.title if info.title else Path(file_path).stem
-            author = info.author if info.author else "Unknown"
-            
-            # For resumes/CVs, try to extract the person's name from first few lines
-            if is_resume:
-                lines = first_page_text.split('\n')
-                # Usually the name is in the first 3 lines and has 2+ words
-                for line in lines[:3]:
-                    if len(line.split()) >= 2 and not any(char.isdigit() for char in line):
-                        author = line.strip()
-                        break
-                
-                return {
-                    'title': "Resume/CV" if title == Path(file_path).stem else title,
-                    'author': author,
-                    'pages': len(reader.pages),
-                    'is_resume': True,
-                    'content_preview': first_page_text[:500]  # Preview for better categorization
-                }
+            first_page_text = doc.load_page(0).get_text("text") if page_count > 0 else ""
+        finally:
+            doc.close()
+        
+        preview = first_page_text[:500]  # Preview for better categorization
+        
+        # Try to determine if it's a resume/CV
+        text_lower = first_page_text.lower()
+        is_resume = any(True for _ in get_resume_automaton().iter(text_lower))
+        
+        title_from_metadata = bool(info.get('title'))
+        title = info.get('title') or Path(file_path).stem
+        author = info.get('author') or "Unknown"
+        
+        # For resumes/CVs, try to extract the person's name from first few lines
+        if is_resume:
+            lines = first_page_text.split('\n')
+            # Usually the name is in the first 3 lines and has 2+ words
+            for line in lines[:3]:
+                parts = line.split()
+                # Skip lines such as phone numbers without scanning every character
+                if len(parts) < 2 or parts[0][0].isdigit():
+                    continue
+                if not any(char.isdigit() for char in line):
+                    author = line.strip()
+                    break
             
             return {
-                'title': title,
+                'title': "Resume/CV" if title == Path(file_path).stem else title,
                 'author': author,
-                'pages': len(reader.pages),
-                'is_resume': False,
-                'content_preview': first_page_text[:500]
+                'pages': page_count,
+                'is_resume': True,
+                'title_from_metadata': title_from_metadata,
+                'content_preview': preview
             }
+        
+        return {
+            'title': title,
+            'author': author,
+            'pages': page_count,
+            'is_resume': False,
+            'title_from_metadata': title_from_metadata,
+            'content_preview': preview
+        }
     except Exception as e:
         st.error(f"Error extracting PDF metadata: {e}")
         return {
@@ -68,11 +139,39 @@ def extract_pdf_metadata(file_path):
             'author': "Unknown", 
             'pages': 0,
             'is_resume': False,
+            'title_from_metadata': False,
             'content_preview': ""
         }
 
-def fetch_book_info(title, author, content_preview="", is_resume=False):
-    """Fetch book information from Google Books API or categorize document"""
+@st.cache_data(ttl=86400, show_spinner=False)
+def search_google_books(title, author):
+    """Look up the first Google Books match for a title/author pair"""
+    # Errors are raised, not returned, so failed lookups are never cached
+    response = get_session().get(
+        GOOGLE_BOOKS_URL,
+        params={'q': f"{title} {author}", 'key': GOOGLE_BOOKS_API_KEY},
+        timeout=(2, 4)  # (connect, read) seconds
+    )
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    
+    if 'items' in data and len(data['items']) > 0:
+        return data['items'][0]['volumeInfo']
+    return None
+
+def lookup_google_books(title, author, is_resume=False, title_from_metadata=True):
+    """Look up a document on Google Books, returning the error instead of raising it"""
+    # Resumes are never looked up, and neither are titles that are just the
+    # file name, which rarely match anything useful
+    if is_resume or not title_from_metadata or len(title) < 4:
+        return None
+    try:
+        return search_google_books(title, author)
+    except Exception as e:
+        return e
+
+def fetch_book_info(title, author, content_preview="", is_resume=False, lookup=None):
+    """Build book information from a Google Books lookup or categorize document"""
     # For resumes/CVs, use a different categorization approach
     if is_resume:
         return {
@@ -83,38 +182,23 @@ def fetch_book_info(title, author, content_preview="", is_resume=False):
             'thumbnail': "https://cdn-icons-png.flaticon.com/512/3135/3135692.png"  # Default resume icon
         }
     
-    # For regular books, use Google Books API
-    query = f"{title} {author}".replace(" ", "+")
-    url = f"https://www.googleapis.com/books/v1/volumes?q={query}&key={GOOGLE_BOOKS_API_KEY}"
-    
-    try:
-        response = requests.get(url)
-        data = response.json()
-        
-        if 'items' in data and len(data['items']) > 0:
-            book_info = data['items'][0]['volumeInfo']
-            return {
-                'title': book_info.get('title', title),
-                'author': book_info.get('authors', [author])[0],
-                'genre': book_info.get('categories', ["Uncategorized"])[0],
-                'description': book_info.get('description', "No description available"),
-                'thumbnail': book_info.get('imageLinks', {}).get('thumbnail', None)
-            }
-    except Exception as e:
-        st.error(f"Error fetching book info: {e}")
+    # For regular books, use the Google Books API result
+    if isinstance(lookup, Exception):
+        st.error(f"Error fetching book info: {lookup}")
+    elif lookup:
+        return {
+            'title': lookup.get('title', title),
+            'author': lookup.get('authors', [author])[0],
+            'genre': lookup.get('categories', ["Uncategorized"])[0],
+            'description': lookup.get('description', "No description available"),
+            'thumbnail': lookup.get('imageLinks', {}).get('thumbnail', None)
+        }
     
     # If Google Books API fails or doesn't have info, try to categorize based on content
-    categories = {
-        "Business": ["business", "management", "finance", "marketing", "economics"],
-        "Technology": ["programming", "software", "computer", "technology", "engineering"],
-        "Science": ["science", "physics", "chemistry", "biology", "research"],
-        "Education": ["education", "learning", "teaching", "academic", "school"],
-        "Other": []
-    }
-    
-    content_lower = content_preview.lower()
-    for category, keywords in categories.items():
-        if any(keyword in content_lower for keyword in keywords):
+    # Only the 500-char preview is classified, whatever length the caller passed
+    hay = content_preview[:500].lower().encode()
+    for category, needle in get_category_needles():
+        if hay.find(needle) != -1:
             return {
                 'title': title,
                 'author': author,
@@ -131,13 +215,32 @@ def fetch_book_info(title, author, content_preview="", is_resume=False):
         'thumbnail': "https://cdn-icons-png.flaticon.com/512/337/337946.png"  # Default document icon
     }
 
-def get_recommendations(genre, library):
+def lookup_all_google_books(metadatas):
+    """Run the Google Books lookups for several uploads concurrently"""
+    # Workers only run the HTTP lookups; results and errors are rendered by the
+    # main script thread, in upload order
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        return list(executor.map(
+            lambda metadata: lookup_google_books(
+                metadata['title'],
+                metadata['author'],
+                metadata.get('is_resume', False),
+                metadata.get('title_from_metadata', True)
+            ),
+            metadatas
+        ))
+
+def get_recommendations(genre, by_genre):
     """Get book recommendations based on genre"""
+    seen = set()
     recommendations = []
-    for book in library:
-        if book['genre'] == genre and book not in recommendations:
+    for book in by_genre.get(genre, []):
+        if book['id'] not in seen:
+            seen.add(book['id'])
             recommendations.append(book)
-    return recommendations[:3]  # Return top 3 recommendations
+            if len(recommendations) == 3:  # Return top 3 recommendations
+                break
+    return recommendations
 
 # Main app interface
 st.title("E-Library Organizer")
@@ -149,57 +252,85 @@ page = st.sidebar.radio("Go to", ["Upload Books", "My Library", "Recommendations
 if page == "Upload Books":
     st.header("Upload Books & Documents")
     
-    uploaded_file = st.file_uploader("Choose a PDF file", type=['pdf'])
+    uploaded_files = st.file_uploader("Choose PDF files", type=['pdf'], accept_multiple_files=True)
     
-    if uploaded_file is not None:
-        # Save the uploaded file
-        file_path = os.path.join(UPLOAD_DIR, uploaded_file.name)
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        
-        # Extract metadata
-        metadata = extract_pdf_metadata(file_path)
+    if uploaded_files:
+        # The files are only saved once they are added to the library
+        file_paths = [os.path.join(UPLOAD_DIR, uploaded_file.name) for uploaded_file in uploaded_files]
         
-        # Fetch additional info
-        book_info = fetch_book_info(
-            metadata['title'], 
-            metadata['author'], 
-            metadata.get('content_preview', ''),
-            metadata.get('is_resume', False)
-        )
+        # Extract metadata straight from the uploaded bytes
+        metadatas = [extract_pdf_metadata(file_path, uploaded_file.getvalue())
+                     for file_path, uploaded_file in zip(file_paths, uploaded_files)]
         
-        # Combine information
-        book_data = {
-            'file_path': file_path,
-            'title': book_info['title'],
-            'author': book_info['author'],
-            'genre': book_info['genre'],
-            'pages': metadata['pages'],
-            'description': book_info['description'],
-            'thumbnail': book_info['thumbnail']
-        }
-        
-        # Display book info
-        st.success(f"File uploaded: {uploaded_file.name}")
+        # Look up additional info, overlapping the Google Books requests
+        lookups = lookup_all_google_books(metadatas)
         
-        col1, col2 = st.columns([1, 3])
-        with col1:
+        for i, (uploaded_file, file_path, metadata, lookup) in enumerate(
+                zip(uploaded_files, file_paths, metadatas, lookups)):
+            # Fetch additional info
+            book_info = fetch_book_info(
+                metadata['title'], 
+                metadata['author'], 
+                metadata.get('content_preview', ''),
+                metadata.get('is_resume', False),
+                lookup
+            )
+            
+            # Combine information
+            book_data = {
+                'file_path': file_path,
+                'title': book_info['title'],
+                'author': book_info['author'],
+                'genre': book_info['genre'],
+                'pages': metadata['pages'],
+                'description': book_info['description'],
+                'thumbnail': book_info['thumbnail']
+            }
+            # Normalize the thumbnail URL once so the library views don't rewrite it per render
             if book_data['thumbnail']:
-                st.image(book_data['thumbnail'], width=150)
-            else:
-                st.write("No thumbnail available")
-        
-        with col2:
-            st.subheader(book_data['title'])
-            st.write(f"**Author:** {book_data['author']}")
-            st.write(f"**Genre:** {book_data['genre']}")
-            st.write(f"**Pages:** {book_data['pages']}")
-            st.write(f"**Description:** {book_data['description'][:200]}...")
-        
-        # Add to library
-        if st.button("Add to Library"):
-            st.session_state.library.append(book_data)
-            st.success("Book added to your library!")
+                book_data['thumbnail'] = book_data['thumbnail'].replace('http://', 'https://', 1)
+            
+            # Display book info
+            st.success(f"File uploaded: {uploaded_file.name}")
+            
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                if book_data['thumbnail']:
+                    st.image(book_data['thumbnail'], width=150)
+                else:
+                    st.write("No thumbnail available")
+            
+            with col2:
+                st.subheader(book_data['title'])
+                st.write(f"**Author:** {book_data['author']}")
+                st.write(f"**Genre:** {book_data['genre']}")
+                st.write(f"**Pages:** {book_data['pages']}")
+                st.write(f"**Description:** {book_data['description'][:200]}...")
+            
+            # Add to library
+            if st.button("Add to Library", key=f"add_{i}_{uploaded_file.name}"):
+                # Books are identified by their content, so the same upload is only added once
+                book_data['id'] = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+                if book_data['id'] in st.session_state.book_ids:
+                    st.info("This book is already in your library.")
+                else:
+                    # Save the uploaded file
+                    with open(file_path, "wb") as f:
+                        uploaded_file.seek(0)
+                        shutil.copyfileobj(uploaded_file, f, length=1024 * 1024)
+                    
+                    # Precompute the lowercase search haystack once instead of per keystroke.
+                    # Fields are joined with a newline, which a text_input query cannot
+                    # contain, so matches never span two fields
+                    book_data['_search'] = "\n".join(
+                        (book_data['title'], book_data['author'], book_data['genre'])).lower()
+                    position = len(st.session_state.library)
+                    st.session_state.library.append(book_data)
+                    st.session_state.book_ids.add(book_data['id'])
+                    for field, index in st.session_state.sorted_by.items():
+                        bisect.insort(index, (book_data[field].lower(), position))
+                    st.session_state.by_genre[book_data['genre']].append(book_data)
+                    st.success("Book added to your library!")
 
 elif page == "My Library":
     st.header("My Library")
@@ -210,22 +341,14 @@ elif page == "My Library":
         # Add search functionality
         search_query = st.text_input("Search your library", "")
         
-        # Filter books based on search query
-        filtered_books = st.session_state.library
-        if search_query:
-            filtered_books = [book for book in st.session_state.library if 
-                             search_query.lower() in book['title'].lower() or 
-                             search_query.lower() in book['author'].lower() or
-                             search_query.lower() in book['genre'].lower()]
-        
         # Add sorting options
         sort_by = st.selectbox("Sort by", ["Title", "Author", "Genre"])
-        if sort_by == "Title":
-            filtered_books = sorted(filtered_books, key=lambda x: x['title'])
-        elif sort_by == "Author":
-            filtered_books = sorted(filtered_books, key=lambda x: x['author'])
-        else:
-            filtered_books = sorted(filtered_books, key=lambda x: x['genre'])
+        
+        # Walk the presorted index for the chosen field and filter by search query
+        library = st.session_state.library
+        q = search_query.lower()
+        filtered_books = [library[position] for _, position in st.session_state.sorted_by[sort_by.lower()]
+                          if q in library[position]['_search']]
         
         # Group books by genre
         genres = {}
@@ -244,8 +367,7 @@ elif page == "My Library":
                 with cols[i % 3]:
                     if book['thumbnail']:
                         try:
-                            thumbnail_url = book['thumbnail'].replace('http://', 'https://')
-                            st.image(thumbnail_url, width=100)
+                            st.image(book['thumbnail'], width=100)
                         except Exception:
                             st.write("📚") # Fallback book emoji if image fails
                     st.write(f"**{book['title']}**")
@@ -259,20 +381,13 @@ elif page == "Recommendations":
         st.info("Add books to your library to get recommendations!")
     else:
         # Get user's most common genre
-        genre_count = {}
-        for book in st.session_state.library:
-            genre = book['genre']
-            if genre in genre_count:
-                genre_count[genre] += 1
-            else:
-                genre_count[genre] = 1
-        
-        favorite_genre = max(genre_count, key=genre_count.get)
+        genre_count = Counter(book['genre'] for book in st.session_state.library)
+        favorite_genre = genre_count.most_common(1)[0][0]
         
         st.subheader(f"Based on your interest in {favorite_genre}")
         
         # Get recommendations
-        recommendations = get_recommendations(favorite_genre, st.session_state.library)
+        recommendations = get_recommendations(favorite_genre, st.session_state.by_genre)
         
         if recommendations:
             cols = st.columns(len(recommendations))
@@ -280,8 +395,7 @@ elif page == "Recommendations":
                 with cols[i]:
                     if book['thumbnail']:
                         try:
-                            thumbnail_url = book['thumbnail'].replace('http://', 'https://')
-                            st.image(thumbnail_url, width=100)
+                            st.image(book['thumbnail'], width=100)
                         except Exception:
                             st.write("📚") # Fallback book emoji
                     st.write(f"**{book['title']}**")